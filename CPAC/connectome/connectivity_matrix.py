@@ -20,7 +20,6 @@
 import os
 from warnings import warn
 import numpy as np
-from nilearn.connectome import ConnectivityMeasure
 from nipype import logging
 from nipype.interfaces import utility as util
 from CPAC.pipeline import nipype_pipeline_engine as pe
@@ -55,9 +54,8 @@ def connectome_name(atlas_name, tool, method):
     -------
     str
     """
-    return os.path.join(os.getcwd(), '_'.join([
-        f'atlas-{atlas_name}', f'desc-{tool}{method}', 'connectome.tsv'
-    ]))
+    return os.path.join(
+        os.getcwd(), f'atlas-{atlas_name}_desc-{tool}{method}_connectome.tsv')
 
 
 def get_connectome_method(method, tool):
@@ -93,6 +91,48 @@ def get_connectome_method(method, tool):
     return cm_method
 
 
+def _pearson_correlation(timeseries):
+    """Compute a Pearson correlation matrix with a single matrix product
+
+    Parameters
+    ----------
+    timeseries : numpy.ndarray
+        timepoints × ROIs
+
+    Returns
+    -------
+    numpy.ndarray
+        ROIs × ROIs, float32
+
+    Examples
+    --------
+    >>> rng = np.random.default_rng(0)
+    >>> timeseries = rng.standard_normal((50, 4))
+    >>> np.allclose(_pearson_correlation(timeseries),
+    ...             np.corrcoef(timeseries, rowvar=False), atol=1e-6)
+    True
+
+    Unstandardized intensities with a large offset stay accurate
+
+    >>> timeseries = 1e5 + rng.standard_normal((1200, 40))
+    >>> np.allclose(_pearson_correlation(timeseries),
+    ...             np.corrcoef(timeseries, rowvar=False), atol=1e-5)
+    True
+    """
+    # remove the mean in the input precision first: raw ROI intensities
+    # carry a large offset that would eat the float32 mantissa. The
+    # centered signal fits float32 comfortably and halves the memory
+    # traffic into the matrix product
+    data = (timeseries - timeseries.mean(axis=0)).astype(np.float32)
+    # scaling to unit norm (rather than unit variance) makes the product
+    # the correlation matrix without another pass over ROIs × ROIs
+    norms = np.linalg.norm(data, axis=0)
+    # leave constant (e.g., empty) ROIs uncorrelated instead of NaN
+    norms[norms == 0] = 1
+    data /= norms
+    return data.T @ data
+
+
 def compute_connectome_nilearn(in_rois, in_file, method, atlas_name):
     """Function to compute a connectome matrix using Nilearn
 
@@ -115,27 +155,35 @@ def compute_connectome_nilearn(in_rois, in_file, method, atlas_name):
     numpy.ndarray or NotImplemented
     """
     from nilearn.input_data import NiftiLabelsMasker
-    from nipype.utils.tmpdirs import TemporaryDirectory
     tool = 'Nilearn'
     output = connectome_name(atlas_name, tool, method)
     method = get_connectome_method(method, tool)
     if method is NotImplemented:
         return NotImplemented
-    with TemporaryDirectory() as cache_dir:
-        masker = NiftiLabelsMasker(labels_img=in_rois,
-                                standardize=True,
-                                verbose=True,
-                                memory=cache_dir,
-                                memory_level=3)
-        timeser = masker.fit_transform(in_file)
+    # _pearson_correlation standardizes in the same pass as the
+    # correlation, so don't have the masker standardize first.
+    # No joblib cache: it would only hash and pickle the timeseries image
+    # into a directory that is discarded as soon as this function returns.
+    masker = NiftiLabelsMasker(labels_img=in_rois,
+                               standardize=(method != 'correlation'),
+                               verbose=0)
+    timeser = masker.fit_transform(in_file)
+    if method == 'correlation':
+        corr_matrix = _pearson_correlation(timeser)
+    else:
+        from nilearn.connectome import ConnectivityMeasure
         correlation_measure = ConnectivityMeasure(kind=method)
         corr_matrix = correlation_measure.fit_transform([timeser])[0]
     np.fill_diagonal(corr_matrix, 1)
-    np.savetxt(output, corr_matrix, delimiter='\t')
+    # shortest format that round-trips the matrix's dtype (9 significant
+    # digits for float32 Pearson, 17 for float64 partial) instead of
+    # savetxt's default '%.18e', which is larger and slower to write
+    np.savetxt(output, corr_matrix, delimiter='\t',
+               fmt='%.9g' if corr_matrix.dtype == np.float32 else '%.17g')
     return output
 
 
-def create_connectome_afni(name, method, pipe_num):
+def create_connectome_afni(name, method, pipe_num, num_threads=1):
     wf = pe.Workflow(name=name)
     inputspec = pe.Node(
         util.IdentityInterface(fields=[
@@ -154,7 +202,12 @@ def create_connectome_afni(name, method, pipe_num):
         name='outputspec'
     )
 
-    timeseries_correlation = pe.Node(NetCorr(), name=name)
+    timeseries_correlation = pe.Node(NetCorr(), name=name,
+                                     n_procs=num_threads)
+    timeseries_correlation.interface.num_threads = num_threads
+    # only the .netcc matrix is consumed; don't write per-ROI whole-brain maps
+    timeseries_correlation.inputs.ts_wb_corr = False
+    timeseries_correlation.inputs.ts_wb_Z = False
     if method:
         timeseries_correlation.inputs.part_corr = (method == 'Partial')
 
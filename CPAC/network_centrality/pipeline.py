@@ -22,10 +22,25 @@ from nipype import logging
 from CPAC.pipeline.nodeblock import nodeblock
 from CPAC.network_centrality.network_centrality import create_centrality_wf
 from CPAC.network_centrality.utils import check_centrality_params, \
-    create_merge_node
+    create_merge_node, select_weight_option
 from CPAC.pipeline.schema import valid_options
 
 logger = logging.getLogger('nipype.workflow')
+_CENTRALITY_OUTPUTS = {
+    ('degree_centrality', 'Weighted'): ('space-template_dcw',
+                                        'degree_weighted'),
+    ('degree_centrality', 'Binarized'): ('space-template_dcb',
+                                         'degree_binarized'),
+    ('eigenvector_centrality', 'Weighted'): ('space-template_ecw',
+                                             'eigen_weighted'),
+    ('eigenvector_centrality', 'Binarized'): ('space-template_ecb',
+                                              'eigen_binarized'),
+    ('local_functional_connectivity_density', 'Weighted'): (
+        'space-template_lfcdw', 'lfcd_weighted'),
+    ('local_functional_connectivity_density', 'Binarized'): (
+        'space-template_lfcdb', 'lfcd_binarized')
+}
+"""(method option, weight option) → (resource, merge node output)"""
 
 
 def connect_centrality_workflow(workflow, c, resample_functional_to_template,
@@ -83,14 +98,6 @@ def connect_centrality_workflow(workflow, c, resample_functional_to_template,
     .. image:: ../../images/generated/network_centrality_detailed.png
         :width: 500
     """
-    # Set method_options variables
-    if method_option == 'degree_centrality':
-        out_list = 'deg_list'
-    elif method_option == 'eigenvector_centrality':
-        out_list = 'eig_list'
-    elif method_option == 'local_functional_connectivity_density':
-        out_list = 'lfcd_list'
-
     threshold_option = c.network_centrality[method_option][
         'correlation_threshold_option'
     ]
@@ -98,9 +105,14 @@ def connect_centrality_workflow(workflow, c, resample_functional_to_template,
 
     # Init workflow name and resource limits
     wf_name = f'afni_centrality_{method_option}_{pipe_num}'
-    num_threads = c.pipeline_setup['system_config'][
+    # the centrality workflows for each method run concurrently, so split
+    # the participant's cores between them
+    concurrent_methods = sum(
+        bool(c.network_centrality[option]['weight_options']) for
+        option in valid_options['centrality']['method_options'])
+    num_threads = max(1, c.pipeline_setup['system_config'][
         'max_cores_per_participant'
-    ]
+    ] // max(1, concurrent_methods))
     memory = c.network_centrality['memory_allocation']
 
     # Format method and threshold options properly and check for
@@ -125,15 +137,13 @@ def connect_centrality_workflow(workflow, c, resample_functional_to_template,
     workflow.connect(template_node, template_out,
                      afni_centrality_wf, 'inputspec.template')
 
-    if 'degree' in method_option:
-        out_list = 'deg_list'
-    elif 'eigen' in method_option:
-        out_list = 'eig_list'
-    elif 'lfcd' in method_option:
-        out_list = 'lfcd_list'
-
-    workflow.connect(afni_centrality_wf, 'outputspec.outfile_list',
-                     merge_node, out_list)
+    for weight_option in c.network_centrality[method_option][
+            'weight_options']:
+        workflow.connect(afni_centrality_wf,
+                         ('outputspec.outfile_list', select_weight_option,
+                          weight_option),
+                         merge_node, _CENTRALITY_OUTPUTS[(method_option,
+                                                          weight_option)][1])
 
 
 @nodeblock(
@@ -187,28 +197,7 @@ def network_centrality(wf, cfg, strat_pool, pipe_num, opt=None):
                                         node, out, merge_node,
                                         option, pipe_num)
             for weight in cfg.network_centrality[option]['weight_options']:
-                _option = option.lower()
-                _weight = weight.lower()
-                if 'degree' in _option:
-                    if 'weight' in _weight:
-                        outputs['space-template_dcw'] = (merge_node,
-                                                         'degree_weighted')
-                    elif 'binarize' in _weight:
-                        outputs['space-template_dcb'] = (merge_node,
-                                                         'degree_binarized')
-                elif 'eigen' in _option:
-                    if 'weight' in _weight:
-                        outputs['space-template_ecw'] = (merge_node,
-                                                         'eigen_weighted')
-                    elif 'binarize' in _weight:
-                        outputs['space-template_ecb'] = (merge_node,
-                                                         'eigen_binarized')
-                elif 'lfcd' in _option or 'local_functional' in _option:
-                    if 'weight' in _weight:
-                        outputs['space-template_lfcdw'] = (merge_node,
-                                                           'lfcd_weighted')
-                    elif 'binarize' in _weight:
-                        outputs['space-template_lfcdb'] = (merge_node,
-                                                           'lfcd_binarized')
+                resource, merge_out = _CENTRALITY_OUTPUTS[(option, weight)]
+                outputs[resource] = (merge_node, merge_out)
 
     return (wf, outputs)
@@ -14,10 +14,12 @@
 
 # You should have received a copy of the GNU Lesser General Public
 # License along with C-PAC. If not, see <https://www.gnu.org/licenses/>.
-from itertools import combinations
+from itertools import combinations, product
 from pathlib import Path
 import pytest
 from CPAC.network_centrality.network_centrality import create_centrality_wf
+from CPAC.network_centrality.pipeline import _CENTRALITY_OUTPUTS, \
+    network_centrality
 from CPAC.pipeline.schema import valid_options
 from CPAC.utils.interfaces.afni import AFNI_SEMVER
 from CPAC.utils.typing import LIST
@@ -62,3 +64,12 @@ def test_create_centrality_wf(method_option: str, weight_options: LIST[str],
     centrality_wf.inputs.inputspec.template = (_DATA_DIR /
                                                'template.nii.gz').absolute()
     centrality_wf.run()
+
+
+def test_centrality_outputs_table():
+    '''Every method × weight combination maps to a declared output'''
+    assert set(_CENTRALITY_OUTPUTS) == set(product(
+        valid_options['centrality']['method_options'],
+        valid_options['centrality']['weight_options']))
+    assert {resource for resource, _ in _CENTRALITY_OUTPUTS.values()
+            } == set(network_centrality.outputs)
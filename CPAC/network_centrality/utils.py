@@ -16,8 +16,9 @@
 # License along with C-PAC. If not, see <https://www.gnu.org/licenses/>.
 import os
 from pathlib import Path
-from typing import Optional, Union
+from typing import Union
 import nibabel as nib
+from nipype.interfaces.utility import IdentityInterface
 from CPAC.pipeline.nipype_pipeline_engine import Node
 from CPAC.pipeline.schema import valid_options
 from CPAC.utils.docs import docstring_parameter
@@ -73,80 +74,44 @@ def convert_pvalue_to_r(datafile, p_value, two_tailed=False):
     return r_value
 
 
-def merge_lists(deg_list: Optional[LIST[str]] = None,
-                eig_list: Optional[LIST[str]] = None,
-                lfcd_list: Optional[LIST[str]] = None):
-    '''Function to actually do the list merging.
+def select_weight_option(outfile_list, weight_option):
+    '''Inline connection function to pick the output for one weight
+    option out of a centrality workflow's ``outputspec.outfile_list``
+
+    Nipype rebuilds inline connection functions from source without the
+    module's imports, so this function is self-contained and unannotated.
 
     Parameters
     ----------
-    deg_list : list of str, optional
-        list of paths to degree centrality outputs
-
-    eig_list : list of str, optional
-        list of paths to eigenvector centrality outputs
+    outfile_list : list of str
+        paths to the outputs of a centrality workflow, each named
+        ``{method_option}_{weight_option}.nii.gz``
 
-    lfcd_list : list of str, optional
-        list of paths to local functional connectivity density outputs
+    weight_option : str
+        one of ``valid_options['centrality']['weight_options']``
 
     Returns
     -------
-    degree_weighted : str
-        path to weighted degree centrality output
-
-    degree_binarized : str
-        path to binarized degree centrality output
-
-    eigen_weighted : str
-        path to weighted eigenvector centrality output
-
-    eigen_binarized : str
-        path to binarized eigenvector centrality output
-
-    lfcd_weighted : str
-        path to weighted local functional connectivity density output
-
-    lfcd_binarized : str
-        path to binarized local functional connectivity density output
+    str or None
+        path to the output for ``weight_option``
+
+    Examples
+    --------
+    >>> select_weight_option(['/out/degree_centrality_Binarized.nii.gz',
+    ...                       '/out/degree_centrality_Weighted.nii.gz'],
+    ...                      'Weighted')
+    '/out/degree_centrality_Weighted.nii.gz'
     '''
-    if deg_list is None:
-        deg_list = []
-    if eig_list is None:
-        eig_list = []
-    if lfcd_list is None:
-        lfcd_list = []
-    merged_list = []
-    merged_list.extend(deg_list)
-    merged_list.extend(eig_list)
-    merged_list.extend(lfcd_list)
-
-    # and we're hijacking this function to parse out the files instead!
-    degree_weighted = None
-    degree_binarized = None
-    eigen_weighted = None
-    eigen_binarized = None
-    lfcd_weighted = None
-    lfcd_binarized = None
-    for path in merged_list:
-        if 'degree' in path and 'Weighted' in path:
-            degree_weighted = path
-        elif 'degree' in path and 'Binarize' in path:
-            degree_binarized = path
-        elif 'eigen' in path and 'Weighted' in path:
-            eigen_weighted = path
-        elif 'eigen' in path and 'Binarize' in path:
-            eigen_binarized = path
-        elif 'local_functional' in path and 'Weighted' in path:
-            lfcd_weighted = path
-        elif 'local_functional' in path and 'Binarize' in path:
-            lfcd_binarized = path
-
-    return (degree_weighted, degree_binarized, eigen_weighted,
-            eigen_binarized, lfcd_weighted, lfcd_binarized)
+    import os
+    for path in outfile_list:
+        if os.path.basename(path).endswith(f'_{weight_option}.nii.gz'):
+            return path
+    return None
 
 
 def create_merge_node(pipe_num: int) -> Node:
-    '''Create a Function Node to merge lists for the centrality workflow
+    '''Create an IdentityInterface Node to collect the outputs of the
+    centrality workflow
 
     Parameters
     ----------
@@ -155,22 +120,18 @@ def create_merge_node(pipe_num: int) -> Node:
     Returns
     -------
     Node
-        a Function Node to merge lists for the centrality workflow
+        an IdentityInterface Node to collect the outputs of the centrality
+        workflow
 
     Notes
     -----
-    Node Inputs::
-
-        deg_list : list of strings
-            list of paths to degree centrality outputs
-
-        eig_list : list of strings
-            list of paths to eigenvector centrality outputs
-
-        lfcd_list : list of strings
-            list of paths to local functional connectivity density outputs
+    Each centrality workflow's ``outputspec.outfile_list`` is connected
+    to the fields below through
+    :py:func:`~CPAC.network_centrality.utils.select_weight_option`.
+    Being an IdentityInterface, the node is removed from the graph before
+    execution, so no worker runs just to route paths.
 
-    Node Outputs::
+    Node Inputs / Outputs::
 
         degree_weighted : string
             path to weighted degree centrality output
@@ -190,14 +151,12 @@ def create_merge_node(pipe_num: int) -> Node:
         lfcd_binarized : string
             path to binarized local functional connectivity density output
     '''
-    return Node(Function(input_names=['deg_list', 'eig_list', 'lfcd_list'],
-                         output_names=['degree_weighted',
-                                       'degree_binarized',
-                                       'eigen_weighted',
-                                       'eigen_binarized',
-                                       'lfcd_weighted',
-                                       'lfcd_binarized'],
-                         function=merge_lists, as_module=True),
+    return Node(IdentityInterface(fields=['degree_weighted',
+                                          'degree_binarized',
+                                          'eigen_weighted',
+                                          'eigen_binarized',
+                                          'lfcd_weighted',
+                                          'lfcd_binarized']),
                 name=f'centrality_merge_node_{pipe_num}')
 
 
@@ -1239,6 +1239,7 @@ def create_regressor_workflow(nuisance_selectors,
                                     'import scipy.signal as signal',
                                     'import nibabel as nb',
                                     'import numpy as np',
+                                    'from scipy.linalg import eigh',
                                     'from CPAC.utils import safe_shape']
 
                     compcor_node = pe.Node(Function(input_names=['data_filename',
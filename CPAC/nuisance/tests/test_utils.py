@@ -1,3 +1,4 @@
+import nibabel as nb
 import numpy as np
 import os
 import pkg_resources as p
@@ -5,6 +6,7 @@ import pytest
 import tempfile
 from CPAC.nuisance.utils import find_offending_time_points
 from CPAC.nuisance.utils import calc_compcor_components
+from CPAC.nuisance.utils import threshold_variance_mask
 
 mocked_outputs = \
     p.resource_filename(
@@ -37,6 +39,58 @@ def test_find_offending_time_points():
     assert set(np.where(np.logical_not(censored))[0].tolist()) == set([1, 3, 7])
 
 
+def test_find_offending_time_points_censor_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fd_j = tmp_path / 'FD_J.1D'
+    fd_j.write_text('0.6\n0.1\n0.1\n0.1\n0.1\n0.1\n0.1\n0.1\n0.1\n0.6\n')
+    # DVARS has no first TR, so its spike at row 4 is TR 5
+    dvars = tmp_path / 'DVARS.1D'
+    dvars.write_text('1\n1\n1\n1\n10\n1\n1\n1\n1\n')
+
+    censors = find_offending_time_points(
+        fd_j_file_path=str(fd_j), dvars_file_path=str(dvars),
+        fd_j_threshold=0.5, dvars_threshold='1.5SD',
+        number_of_previous_trs_to_censor=1,
+        number_of_subsequent_trs_to_censor=1)
+
+    # the FD windows around TRs 0 and 9 run past both ends of the series
+    with open(censors, 'rb') as censor_file:
+        assert censor_file.read() == \
+            b'censor\n0\n0\n1\n1\n0\n0\n0\n1\n0\n0\n'
+
+
+# variances are 1, 4, 9, 16 in slice 0 and 25, 36, 49, 64 in slice 1; slice 2
+# has no mask voxels, so per-slice PCT and SD thresholds fall back to zero
+# there and flag its one nonzero voxel, as the per-slice workflow did
+@pytest.mark.parametrize('method,threshold,by_slice,flagged', [
+    ('PCT', 25.0, False, [(2, 1, 1), (2, 2, 1)]),
+    ('PCT', 25.0, True, [(2, 2, 0), (2, 2, 1), (0, 0, 2)]),
+    ('SD', 1.0, False, [(2, 1, 1), (2, 2, 1)]),
+    ('SD', 1.0, True, [(2, 2, 0), (2, 2, 1), (0, 0, 2)]),
+    ('VAR', 30.0, False, [(1, 2, 1), (2, 1, 1), (2, 2, 1)]),
+    ('VAR', 30.0, True, [(1, 2, 1), (2, 1, 1), (2, 2, 1)]),
+])
+def test_threshold_variance_mask(tmp_path, monkeypatch, method, threshold,
+                                 by_slice, flagged):
+    monkeypatch.chdir(tmp_path)
+    mask = np.zeros((4, 4, 3), dtype=np.uint8)
+    mask[1:3, 1:3, :2] = 1
+    std = np.zeros(mask.shape, dtype=np.float32)
+    std[1:3, 1:3, 0] = [[1, 2], [3, 4]]
+    std[1:3, 1:3, 1] = [[5, 6], [7, 8]]
+    std[0, 0, 2] = 3
+    nb.Nifti1Image(std, np.eye(4)).to_filename('std.nii.gz')
+    nb.Nifti1Image(mask, np.eye(4)).to_filename('mask.nii.gz')
+
+    out_file = threshold_variance_mask('std.nii.gz', 'mask.nii.gz', method,
+                                       threshold, by_slice)
+    variance_mask = np.asanyarray(nb.load(out_file).dataobj).astype(bool)
+
+    expected = np.zeros(mask.shape, dtype=bool)
+    expected[tuple(np.transpose(flagged))] = True
+    assert (variance_mask == expected).all()
+
+
 @pytest.mark.skip(reason='needs local files not included in package')
 def test_calc_compcor_components():
 
@@ -11,12 +11,15 @@ from nipype import logging
 
 from CPAC.nuisance.utils.compcor import calc_compcor_components
 from CPAC.nuisance.utils.crc import encode as crc_encode
-from CPAC.utils.interfaces.fsl import Merge as fslMerge
 from CPAC.utils.interfaces.function import Function
 from CPAC.registration.utils import check_transforms, generate_inverse_transform_flags
 
 logger = logging.getLogger('nipype.workflow')
 
+_THRESHOLD_NUMBER = r"([0-9]+\.?[0-9]*|\.[0-9]+)"
+_SD_RE = re.compile(_THRESHOLD_NUMBER + r"\s*SD")
+_PCT_RE = re.compile(_THRESHOLD_NUMBER + r"\s*PCT")
+
 
 def find_offending_time_points(fd_j_file_path=None, fd_p_file_path=None, dvars_file_path=None,
                                fd_j_threshold=None, fd_p_threshold=None, dvars_threshold=None,
@@ -50,9 +53,9 @@ def find_offending_time_points(fd_j_file_path=None, fd_p_file_path=None, dvars_f
     """
     import numpy as np
     import os
-    import re
+    import pandas as pd
 
-    offending_time_points = set()
+    offending_time_points = np.empty(0, dtype=int)
     time_course_len = 0
 
     types = ['FDJ', 'FDP', 'DVARS']
@@ -76,9 +79,13 @@ def find_offending_time_points(fd_j_file_path=None, fd_p_file_path=None, dvars_f
         if not threshold:
             raise ValueError("Method requires the specification of a threshold, none received")
 
-        metric = np.loadtxt(file_path)
+        # pandas' C parser is several times faster than np.loadtxt
+        metric = pd.read_csv(file_path, sep=r'\s+', header=None,
+                             comment='#', dtype=np.float64,
+                             engine='c').to_numpy().ravel()
         if type == 'DVARS':
-            metric = np.array([0.0] + metric.tolist())
+            # DVARS has no value for the first TR
+            metric = np.concatenate(([0.0], metric))
 
         if not time_course_len:
             time_course_len = metric.shape[0]
@@ -86,8 +93,7 @@ def find_offending_time_points(fd_j_file_path=None, fd_p_file_path=None, dvars_f
             assert time_course_len == metric.shape[0], "Threshold metric files does not have same size."
 
         try:
-            threshold_sd = \
-                re.match(r"([0-9]*\.*[0-9]*)\s*SD", str(threshold))
+            threshold_sd = _SD_RE.match(str(threshold))
 
             if threshold_sd:
                 threshold_sd = float(threshold_sd.groups()[0])
@@ -99,71 +105,118 @@ def find_offending_time_points(fd_j_file_path=None, fd_p_file_path=None, dvars_f
             raise ValueError("Could not translate threshold {0} into a "
                              "meaningful value".format(threshold))
 
-        offending_time_points |= \
-            set(np.where(metric > threshold)[0].tolist())
-
-    extended_censors = []
-    for censor in offending_time_points:
-        extended_censors += list(range(
-            (censor - number_of_previous_trs_to_censor),
-            (censor + number_of_subsequent_trs_to_censor + 1)))
+        offending_time_points = np.union1d(offending_time_points,
+                                           np.flatnonzero(metric > threshold))
 
-    extended_censors = [
-        censor
-        for censor in np.unique(extended_censors)
-        if 0 <= censor < time_course_len
-    ]
+    # broadcast each censor over its window, then drop out-of-range TRs
+    window = np.arange(-number_of_previous_trs_to_censor,
+                       number_of_subsequent_trs_to_censor + 1)
+    extended_censors = (
+        offending_time_points[:, np.newaxis] + window).ravel()
+    extended_censors = extended_censors[
+        (extended_censors >= 0) & (extended_censors < time_course_len)]
 
-    censor_vector = np.ones((time_course_len, 1))
-    censor_vector[extended_censors] = 0
+    censor_vector = np.ones(time_course_len, dtype=bool)
+    censor_vector[extended_censors] = False
 
+    # one fixed-width '1\n' or '0\n' record per TR, written in one call
+    # rather than formatted row by row as np.savetxt does
     out_file_path = os.path.join(os.getcwd(), "censors.tsv")
-    np.savetxt(
-        out_file_path, censor_vector, fmt='%d', header='censor', comments=''
-    )
+    with open(out_file_path, 'wb') as out_file:
+        out_file.write(b'censor\n')
+        out_file.write(np.where(censor_vector, b'1\n', b'0\n').tobytes())
 
     return out_file_path
 
 
-def compute_threshold(in_file, mask, threshold):
-    return threshold
-
-
-def compute_pct_threshold(in_file, mask, threshold_pct):
+def threshold_variance_mask(std_file, mask_file, threshold_method,
+                            threshold, by_slice=False):
+    """
+    Square a temporal standard deviation image and binarize it against a
+    variance threshold, optionally computed slice by slice.
+
+    :param std_file: path to the voxelwise temporal standard deviation.
+    :param mask_file: path to the mask the threshold is computed within.
+    :param threshold_method: 'VAR' for an absolute threshold, 'SD' for a
+        multiple of the standard deviation above the mean variance, or
+        'PCT' for the top percentile of the variance distribution.
+    :param threshold: threshold value matching threshold_method.
+    :param by_slice: compute one threshold per axial slice.
+
+    :return: path to the binary mask of high-variance voxels.
+    """
+    import os
     import nibabel as nb
     import numpy as np
-    m = nb.load(mask).get_fdata().astype(bool)
-    if not np.any(m):
-        return 0.0
-    d = nb.load(in_file).get_fdata()[m]
-    return np.percentile(
-        d,
-        100.0 - threshold_pct
-    )
 
+    std_img = nb.load(std_file)
+    mask_img = nb.load(mask_file)
+    if mask_img.shape != std_img.shape:
+        raise ValueError('The mask {0} with shape {1} does not match {2} '
+                         'with shape {3}.'.format(mask_file, mask_img.shape,
+                                                  std_file, std_img.shape))
+
+    # single precision is plenty for thresholding and halves the memory
+    variance = np.square(std_img.get_fdata(dtype=np.float32))
+    # binarize the mask in its stored dtype rather than decoding to float64
+    mask = np.asanyarray(mask_img.dataobj) != 0
+
+    # one column per axial slice, or a single column for the whole volume
+    n_columns = variance.shape[2] if by_slice else 1
+    values = variance.reshape(-1, n_columns)
+    in_mask = mask.reshape(-1, n_columns)
+    counts = in_mask.sum(axis=0)
+
+    if threshold_method == 'PCT':
+        # voxels outside the mask sort to the end of each column as NaN, so
+        # np.percentile's linear interpolation can index the sorted values
+        ranked = np.sort(np.where(in_mask, values, np.nan), axis=0)
+        last = np.maximum(counts - 1, 0)
+        position = last * (100.0 - threshold) / 100.0
+        lower = np.floor(position).astype(int)
+        upper = np.minimum(lower + 1, last)
+        lower_value = np.take_along_axis(ranked, lower[np.newaxis], 0)[0]
+        upper_value = np.take_along_axis(ranked, upper[np.newaxis], 0)[0]
+        thresholds = lower_value + \
+            (position - lower) * (upper_value - lower_value)
+    elif threshold_method == 'SD':
+        n_voxels = np.maximum(counts, 1)
+        mean = np.where(in_mask, values, 0).sum(axis=0) / n_voxels
+        std = np.sqrt(
+            np.square(np.where(in_mask, values - mean, 0)).sum(axis=0) /
+            n_voxels)
+        thresholds = mean + threshold * std
+    else:
+        thresholds = np.full(n_columns, threshold)
+    if threshold_method != 'VAR':
+        # an empty mask gives a zero threshold, as it did per slice before
+        thresholds = np.where(counts > 0, thresholds, 0)
+    thresholds = thresholds.astype(np.float32)
 
-def compute_sd_threshold(in_file, mask, threshold_sd):
-    import nibabel as nb
-    import numpy as np
-    m = nb.load(mask).get_fdata().astype(bool)
-    if not np.any(m):
-        return 0.0
-    d = nb.load(in_file).get_fdata()[m]
-    return d.mean() + threshold_sd * d.std()
+    # same as fslmaths -thr <threshold> -bin on each slice
+    variance_mask = (variance >= thresholds) & (variance > 0)
+
+    out_img = nb.Nifti1Image(variance_mask.astype(np.uint8),
+                             std_img.affine, std_img.header)
+    out_img.set_data_dtype(np.uint8)
+    out_file = os.path.join(os.getcwd(), 'variance_mask.nii.gz')
+    out_img.to_filename(out_file)
+    return out_file
 
 
 def temporal_variance_mask(threshold, by_slice=False, erosion=False, degree=1):
 
     threshold_method = "VAR"
+    threshold_value = threshold
 
     if isinstance(threshold, str):
         regex_match = {
-            "SD": r"([0-9]+(\.[0-9]+)?)\s*SD",
-            "PCT": r"([0-9]+(\.[0-9]+)?)\s*PCT",
+            "SD": _SD_RE,
+            "PCT": _PCT_RE,
         }
 
         for method, regex in regex_match.items():
-            matched = re.match(regex, threshold)
+            matched = regex.match(threshold)
             if matched:
                 threshold_method = method
                 threshold_value = matched.groups()[0]
@@ -201,71 +254,22 @@ def temporal_variance_mask(threshold, by_slice=False, erosion=False, degree=1):
     wf.connect(input_node, 'mask_file_path', std, 'mask')
     wf.connect(detrend, 'out_file', std, 'in_file')
 
-    var = pe.Node(afni.Calc(expr='a*a', outputtype='NIFTI'), name='var')
-    wf.connect(std, 'out_file', var, 'in_file_a')
-
-    if by_slice:
-        slices = pe.Node(fsl.Slice(), name='slicer')
-        wf.connect(var, 'out_file', slices, 'in_file')
-
-        mask_slices = pe.Node(fsl.Slice(), name='mask_slicer')
-        wf.connect(input_node, 'mask_file_path', mask_slices, 'in_file')
-
-        mapper = pe.MapNode(util.IdentityInterface(fields=['out_file', 'mask_file']), name='slice_mapper', iterfield=['out_file', 'mask_file'])
-        wf.connect(slices, 'out_files', mapper, 'out_file')
-        wf.connect(mask_slices, 'out_files', mapper, 'mask_file')
-
-    else:
-        mapper_list = pe.Node(util.Merge(1), name='slice_mapper_list')
-        wf.connect(var, 'out_file', mapper_list, 'in1')
-
-        mask_mapper_list = pe.Node(util.Merge(1), name='slice_mask_mapper_list')
-        wf.connect(input_node, 'mask_file_path', mask_mapper_list, 'in1')
-
-        mapper = pe.Node(util.IdentityInterface(fields=['out_file', 'mask_file']), name='slice_mapper')
-        wf.connect(mapper_list, 'out', mapper, 'out_file')
-        wf.connect(mask_mapper_list, 'out', mapper, 'mask_file')
-
-    if threshold_method == "PCT":
-        threshold_node = pe.MapNode(Function(input_names=['in_file', 'mask', 'threshold_pct'],
-                                             output_names=['threshold'],
-                                             function=compute_pct_threshold, as_module=True),
-                                    name='threshold_value', iterfield=['in_file', 'mask'])
-        threshold_node.inputs.threshold_pct = threshold_value
-        wf.connect(mapper, 'out_file', threshold_node, 'in_file')
-        wf.connect(mapper, 'mask_file', threshold_node, 'mask')
-
-    elif threshold_method == "SD":
-        threshold_node = pe.MapNode(Function(input_names=['in_file', 'mask', 'threshold_sd'],
-                                             output_names=['threshold'],
-                                             function=compute_sd_threshold, as_module=True),
-                                    name='threshold_value', iterfield=['in_file', 'mask'])
-        threshold_node.inputs.threshold_sd = threshold_value
-        wf.connect(mapper, 'out_file', threshold_node, 'in_file')
-        wf.connect(mapper, 'mask_file', threshold_node, 'mask')
-
-    else:
-        threshold_node = pe.MapNode(Function(input_names=['in_file', 'mask', 'threshold'],
-                                             output_names=['threshold'],
-                                             function=compute_threshold, as_module=True),
-                                    name='threshold_value', iterfield=['in_file', 'mask'])
-        threshold_node.inputs.threshold = threshold_value
-        wf.connect(mapper, 'out_file', threshold_node, 'in_file')
-        wf.connect(mapper, 'mask_file', threshold_node, 'mask')
-
-    threshold_mask = pe.MapNode(interface=fsl.maths.Threshold(), name='threshold', iterfield=['in_file', 'thresh'])
-    threshold_mask.inputs.args = '-bin'
-    wf.connect(mapper, 'out_file', threshold_mask, 'in_file')
-    wf.connect(threshold_node, 'threshold', threshold_mask, 'thresh')
-
-    merge_slice_masks = pe.Node(interface=fslMerge(), name='merge_slice_masks')
-    merge_slice_masks.inputs.dimension = 'z'
-    wf.connect(
-        threshold_mask, 'out_file',
-        merge_slice_masks, 'in_files'
-    )
-
-    wf.connect(merge_slice_masks, 'merged_file', output_node, 'mask')
+    threshold_mask = pe.Node(Function(input_names=['std_file',
+                                                   'mask_file',
+                                                   'threshold_method',
+                                                   'threshold',
+                                                   'by_slice'],
+                                      output_names=['mask'],
+                                      function=threshold_variance_mask,
+                                      as_module=True),
+                             name='threshold')
+    threshold_mask.inputs.threshold_method = threshold_method
+    threshold_mask.inputs.threshold = threshold_value
+    threshold_mask.inputs.by_slice = by_slice
+    wf.connect(std, 'out_file', threshold_mask, 'std_file')
+    wf.connect(input_node, 'mask_file_path', threshold_mask, 'mask_file')
+
+    wf.connect(threshold_mask, 'mask', output_node, 'mask')
 
     return wf
 
@@ -501,12 +505,27 @@ def generate_summarize_tissue_mask_ventricles_masking(nuisance_wf,
 
 class NuisanceRegressor(object):
 
+    # regressor abbreviations, in the order they appear in the encoding
+    _regressor_codes = OrderedDict([
+        ('GreyMatter', 'GM'),
+        ('WhiteMatter', 'WM'),
+        ('CerebrospinalFluid', 'CSF'),
+        ('tCompCor', 'tC'),
+        ('aCompCor', 'aC'),
+        ('GlobalSignal', 'G'),
+        ('Motion', 'M'),
+        ('Custom', 'T'),
+        ('PolyOrt', 'P'),
+        ('Bandpass', 'BP'),
+        ('Censor', 'C')
+    ])
+
     def __init__(self, selector):
         self.selector = selector
 
         if 'Bandpass' in self.selector:
             s = self.selector['Bandpass']
-            if type(s) is not dict or \
+            if not isinstance(s, dict) or \
                (not s.get('bottom_frequency') and
                 not s.get('top_frequency')):
 
@@ -551,7 +570,7 @@ class NuisanceRegressor(object):
             'DetrendNormMean': 'DNM',
         }
 
-        if type(summ) == dict:
+        if isinstance(summ, dict):
             method = summ['method']
             rep = methods[method]
             if method in ['DetrendPC', 'PC']:
@@ -563,19 +582,7 @@ class NuisanceRegressor(object):
 
     @staticmethod
     def encode(selector):
-        regs = OrderedDict([
-            ('GreyMatter', 'GM'),
-            ('WhiteMatter', 'WM'),
-            ('CerebrospinalFluid', 'CSF'),
-            ('tCompCor', 'tC'),
-            ('aCompCor', 'aC'),
-            ('GlobalSignal', 'G'),
-            ('Motion', 'M'),
-            ('Custom', 'T'),
-            ('PolyOrt', 'P'),
-            ('Bandpass', 'BP'),
-            ('Censor', 'C')
-        ])
+        regs = NuisanceRegressor._regressor_codes
 
         tissues = ['GreyMatter', 'WhiteMatter', 'CerebrospinalFluid']
 
@@ -594,23 +601,23 @@ class NuisanceRegressor(object):
         # P-2
         # B-T0.01-B0.1
 
-        for r in regs.keys():
+        for r, code in regs.items():
             if r not in selector:
                 continue
 
             s = selector[r]
 
-            pieces = [regs[r]]
+            pieces = [code]
 
             if r in tissues:
                 if s.get('extraction_resolution') and s['extraction_resolution'] != 'Functional':
                     res = "%.2gmm" % s['extraction_resolution']
                     if s.get('erode_mask'):
                         res += 'E'
-                    pieces += [res]      
+                    pieces.append(res)
 
-                pieces += [NuisanceRegressor._summary_params(s)]
-                pieces += [NuisanceRegressor._derivative_params(s)]
+                pieces.append(NuisanceRegressor._summary_params(s))
+                pieces.append(NuisanceRegressor._derivative_params(s))
 
             elif r == 'tCompCor':
 
@@ -619,7 +626,7 @@ class NuisanceRegressor(object):
                     threshold += 'S'
                 t = s.get('threshold')
                 if t:
-                    if type(t) != str:
+                    if not isinstance(t, str):
                         t = "%.2f" % t
                     threshold += t
                 if s.get('erode_mask'):
@@ -628,45 +635,45 @@ class NuisanceRegressor(object):
                     d = s.get('degree')
                     threshold += str(d)
 
-                pieces += [threshold]
-                pieces += [NuisanceRegressor._summary_params(s)]
-                pieces += [NuisanceRegressor._derivative_params(s)]
+                pieces.append(threshold)
+                pieces.append(NuisanceRegressor._summary_params(s))
+                pieces.append(NuisanceRegressor._derivative_params(s))
 
             elif r == 'aCompCor':
                 if s.get('tissues'):
-                    pieces += ["+".join([regs[t] for t in sorted(s['tissues'])])]
+                    pieces.append("+".join([regs[t] for t in sorted(s['tissues'])]))
 
                 if s.get('extraction_resolution'):
                     res = "%.2gmm" % s['extraction_resolution']
                     if s.get('erode_mask'):
                         res += 'E'
-                    pieces += [res]
+                    pieces.append(res)
 
-                pieces += [NuisanceRegressor._summary_params(s)]
-                pieces += [NuisanceRegressor._derivative_params(s)]
+                pieces.append(NuisanceRegressor._summary_params(s))
+                pieces.append(NuisanceRegressor._derivative_params(s))
 
             elif r == 'Custom':
                 for ss in s:
-                    pieces += [
+                    pieces.append(
                         os.path.basename(ss['file'])[0:5] +
                         crc_encode(ss['file'])
-                    ]
+                    )
 
             elif r == 'GlobalSignal':
-                pieces += [NuisanceRegressor._summary_params(s)]
-                pieces += [NuisanceRegressor._derivative_params(s)]
+                pieces.append(NuisanceRegressor._summary_params(s))
+                pieces.append(NuisanceRegressor._derivative_params(s))
 
             elif r == 'Motion':
-                pieces += [NuisanceRegressor._derivative_params(s)]
+                pieces.append(NuisanceRegressor._derivative_params(s))
 
             elif r == 'PolyOrt':
-                pieces += ['%d' % s['degree']]
+                pieces.append('%d' % s['degree'])
 
             elif r == 'Bandpass':
                 if s.get('bottom_frequency'):
-                    pieces += ['B%.2g' % s['bottom_frequency']]
+                    pieces.append('B%.2g' % s['bottom_frequency'])
                 if s.get('top_frequency'):
-                    pieces += ['T%.2g' % s['top_frequency']]
+                    pieces.append('T%.2g' % s['top_frequency'])
 
             elif r == 'Censor':
                 censoring = {
@@ -682,7 +689,7 @@ class NuisanceRegressor(object):
                     'DVARS': 'DV',
                 }
 
-                pieces += [censoring[s['method']]]
+                pieces.append(censoring[s['method']])
 
                 trs_range = ['0', '0']
                 if s.get('number_of_previous_trs_to_censor'):
@@ -690,19 +697,20 @@ class NuisanceRegressor(object):
                 if s.get('number_of_subsequent_trs_to_censor'):
                     trs_range[1] = '%d' % s['number_of_subsequent_trs_to_censor']
 
-                pieces += ['+'.join(trs_range)]
+                pieces.append('+'.join(trs_range))
 
                 threshs = sorted(s['thresholds'], reverse=True, key=lambda d: d['type'])
                 for st in threshs:
                     thresh = thresholds[st['type']]
-                    if type(st['value']) == str:
+                    if isinstance(st['value'], str):
                         thresh += st['value']
                     else:
                         thresh += "%.2g" % st['value']
 
-                    pieces += [thresh]
+                    pieces.append(thresh)
 
-            selectors_representations += ['-'.join([_f for _f in pieces if _f])]
+            selectors_representations.append(
+                '-'.join(piece for piece in pieces if piece))
 
         return "_".join(selectors_representations)
 
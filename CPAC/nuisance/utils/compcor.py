@@ -4,7 +4,7 @@ import nibabel as nb
 import numpy as np
 from CPAC.utils import safe_shape
 from nipype import logging
-from scipy.linalg import svd
+from scipy.linalg import eigh, svd
 
 iflogger = logging.getLogger('nipype.interface')
 
@@ -15,25 +15,23 @@ def calc_compcor_components(data_filename, num_components, mask_filename):
         raise ValueError('Improper value for num_components ({0}), should be >= 1.'.format(num_components))
 
     try:
-        image_data = nb.load(data_filename).get_fdata().astype(np.float64)
+        # keep the stored dtype until the voxels outside the mask are gone
+        image_data = np.asanyarray(nb.load(data_filename).dataobj)
     except:
         print('Unable to load data from {0}'.format(data_filename))
         raise
 
     try:
-        binary_mask = nb.load(mask_filename).get_fdata().astype(np.int16)
+        # read the mask in its stored dtype instead of decoding to float64
+        binary_mask = np.asanyarray(nb.load(mask_filename).dataobj) > 0
     except:
         print('Unable to load data from {0}'.format(mask_filename))
 
     if not safe_shape(image_data, binary_mask):
         raise ValueError('The data in {0} and {1} do not have a consistent shape'.format(data_filename, mask_filename))
 
-    # make sure that the values in binary_mask are binary
-    binary_mask[binary_mask > 0] = 1
-    binary_mask[binary_mask != 1] = 0
-
     # reduce the image data to only the voxels in the binary mask
-    image_data = image_data[binary_mask==1, :]
+    image_data = image_data[binary_mask, :].astype(np.float64, copy=False)
 
     # filter out any voxels whose variance equals 0
     print('Removing zero variance components')
@@ -45,16 +43,25 @@ def calc_compcor_components(data_filename, num_components, mask_filename):
         raise Exception(err)
 
     print('Detrending and centering data')
-    Y = signal.detrend(image_data, axis=1, type='linear').T
-    Yc = Y - np.tile(Y.mean(0), (Y.shape[0], 1))
-    Yc = Yc / np.tile(np.array(Yc.std(0)).reshape(1,Yc.shape[1]), (Yc.shape[0],1))
-
-    print('Calculating SVD decomposition of Y*Y\'')
-    U, S, Vh = np.linalg.svd(Yc, full_matrices=False)
+    # image_data is already a masked copy, so detrend it in place
+    Yc = signal.detrend(image_data, axis=1, type='linear',
+                        overwrite_data=True).T
+    # broadcast in place rather than tiling the mean and std to full size
+    Yc -= Yc.mean(0)
+    Yc /= Yc.std(0)
+
+    print('Calculating leading eigenvectors of Yc*Yc\'')
+    # the leading left singular vectors of Yc are the leading eigenvectors
+    # of the T x T matrix Yc*Yc', so only solve for the ones we keep
+    num_components = min(num_components, *Yc.shape)
+    num_timepoints = Yc.shape[0]
+    _, U = eigh(Yc.dot(Yc.T), subset_by_index=[
+        num_timepoints - num_components, num_timepoints - 1])
+    U = U[:, ::-1]
 
     # write out the resulting regressor file
     regressor_file = os.path.join(os.getcwd(), 'compcor_regressors.1D')
-    np.savetxt(regressor_file, U[:, :num_components], delimiter='\t', fmt='%16g')
+    np.savetxt(regressor_file, U, delimiter='\t', fmt='%16g')
 
     return regressor_file
 
@@ -847,10 +847,24 @@ def timeseries_extraction_AVG(wf, cfg, strat_pool, pipe_num, opt=None):
     # create the graphs:
     # - connectivity matrix
     matrix_outputs = {}
+    resample_brain_mask_roi = None
+    cm_tools = [tool for tool in cfg['timeseries_extraction',
+                'connectivity_matrix', 'using'] if tool != 'ndmg']
+    # 3dNetCorr nodes run concurrently across atlases (iterables) and the
+    # measures AFNI implements, so split the participant's cores between
+    # them rather than letting each one claim all of them
+    afni_measures = [
+        cm_measure for cm_measure in cfg['timeseries_extraction',
+                                         'connectivity_matrix', 'measure']
+        if 'AFNI' in cm_tools and
+        get_connectome_method(cm_measure, 'AFNI') is not NotImplemented]
+    concurrent_netcorrs = len(
+        cfg.timeseries_extraction['tse_atlases']['Avg']) * len(afni_measures)
+    netcorr_threads = max(1, cfg.pipeline_setup['system_config'][
+        'max_cores_per_participant'] // max(1, concurrent_netcorrs))
     for cm_measure in cfg['timeseries_extraction', 'connectivity_matrix',
                           'measure']:
-        for cm_tool in [tool for tool in cfg['timeseries_extraction',
-                        'connectivity_matrix', 'using'] if tool != 'ndmg']:
+        for cm_tool in cm_tools:
             implementation = get_connectome_method(cm_measure, cm_tool)
             if implementation is NotImplemented:
                 continue
@@ -864,26 +878,32 @@ def timeseries_extraction_AVG(wf, cfg, strat_pool, pipe_num, opt=None):
                 timeseries_correlation = create_connectome_afni(
                     name=f'connectomeAfni{cm_measure}_{pipe_num}',
                     method=cm_measure,
-                    pipe_num=pipe_num
+                    pipe_num=pipe_num,
+                    num_threads=netcorr_threads
                 )
                 brain_mask_node, brain_mask_out = strat_pool.get_data([
                     'space-template_desc-bold_mask'])
                 if 'func_to_ROI' in realignment:
-                    resample_brain_mask_roi = pe.Node(
-                        resample_function(),
-                        name=f'resample_brain_mask_roi_{pipe_num}')
-                    resample_brain_mask_roi.inputs.realignment = realignment
-                    resample_brain_mask_roi.inputs.identity_matrix = (
-                        cfg.registration_workflows['functional_registration'][
-                            'func_registration_to_template'
-                        ]['FNIRT_pipelines']['identity_matrix'])
-                    wf.connect([
-                        (brain_mask_node, resample_brain_mask_roi, [
-                            (brain_mask_out, 'in_func')]),
-                        (roi_dataflow, resample_brain_mask_roi, [
-                            ('outputspec.out_file', 'in_roi')]),
-                        (resample_brain_mask_roi, timeseries_correlation, [
-                            ('out_func', 'inputspec.mask')])])
+                    # resample the mask once per atlas and share it
+                    # across measures
+                    if resample_brain_mask_roi is None:
+                        resample_brain_mask_roi = pe.Node(
+                            resample_function(),
+                            name=f'resample_brain_mask_roi_{pipe_num}')
+                        resample_brain_mask_roi.inputs.realignment = \
+                            realignment
+                        resample_brain_mask_roi.inputs.identity_matrix = (
+                            cfg.registration_workflows[
+                                'functional_registration'
+                            ]['func_registration_to_template'
+                              ]['FNIRT_pipelines']['identity_matrix'])
+                        wf.connect([
+                            (brain_mask_node, resample_brain_mask_roi, [
+                                (brain_mask_out, 'in_func')]),
+                            (roi_dataflow, resample_brain_mask_roi, [
+                                ('outputspec.out_file', 'in_roi')])])
+                    wf.connect(resample_brain_mask_roi, 'out_func',
+                               timeseries_correlation, 'inputspec.mask')
                 else:
                     wf.connect(brain_mask_node, brain_mask_out,
                                timeseries_correlation, 'inputspec.mask')
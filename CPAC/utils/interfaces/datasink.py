@@ -11,6 +11,7 @@ import shutil
 import re
 import copy
 import tempfile
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
 from os.path import join, dirname
 from shutil import SameFileError
 from warnings import warn
@@ -33,6 +34,63 @@ iflogger = logging.getLogger('nipype.interface')
 
 RETRY = 5
 RETRY_WAIT = 5
+MD5_CHUNK_SIZE = 1 << 20
+S3_MAX_WORKERS = 16
+S3_MULTIPART_CHUNK_SIZE = 8 * (1 << 20)
+
+
+def _md5_file(path):
+    """Return the hex MD5 digest of a file, read in MD5_CHUNK_SIZE chunks
+    so large images are never held in memory whole.
+    """
+    import hashlib
+
+    md5 = hashlib.md5()
+    # read unbuffered into one reused buffer instead of allocating a new
+    # bytes object per chunk
+    buffer = bytearray(MD5_CHUNK_SIZE)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as src:
+        while True:
+            size = src.readinto(buffer)
+            if not size:
+                break
+            md5.update(view[:size])
+    return md5.hexdigest()
+
+
+def _multipart_etag(path, part_size=S3_MULTIPART_CHUNK_SIZE):
+    """Return the ETag S3 reports for a multipart upload of a file in
+    part_size parts: the MD5 of the concatenated part digests, followed by
+    the number of parts.
+    """
+    import hashlib
+
+    part_digests = []
+    with open(path, 'rb') as src:
+        for part in iter(lambda: src.read(part_size), b''):
+            part_digests.append(hashlib.md5(part).digest())
+    return '%s-%d' % (hashlib.md5(b''.join(part_digests)).hexdigest(),
+                      len(part_digests))
+
+
+def _list_files(directory):
+    """Return the paths of all files under a directory.
+
+    Like collecting the files from os.walk, symlinked directories are not
+    descended into, but this reads each directory with a single scandir
+    and lets the DirEntry build the paths.
+    """
+    files = []
+    stack = [directory]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if not entry.is_dir():
+                    files.append(entry.path)
+                elif not entry.is_symlink():
+                    stack.append(entry.path)
+    return files
 
 
 def _get_head_bucket(s3_resource, bucket_name):
@@ -377,10 +435,8 @@ class DataSink(IOBase):
         Method to upload outputs to S3 bucket instead of on local disk
         '''
 
-        # Import packages
-        import hashlib
-        import os
-
+        # boto3 is only needed, and only imported, when sinking to S3
+        from boto3.s3.transfer import TransferConfig
         from botocore.exceptions import ClientError
 
         # Init variables
@@ -393,50 +449,81 @@ class DataSink(IOBase):
 
         # If src is a directory, collect files (this assumes dst is a dir too)
         if os.path.isdir(src):
-            src_files = []
-            for root, dirs, files in os.walk(src):
-                src_files.extend([os.path.join(root, fil) for fil in files])
-            # Make the dst files have the dst folder as base dir
+            src_files = _list_files(src)
+            # Make the dst files have the dst folder as base dir; every
+            # src_f starts with src, so slice it off rather than split
+            src_len = len(src)
             dst_files = [
-                os.path.join(dst,
-                             src_f.split(src)[1]) for src_f in src_files
+                os.path.join(dst, src_f[src_len:]) for src_f in src_files
             ]
         else:
             src_files = [src]
             dst_files = [dst]
 
-        # Iterate over src and copy to dst
-        for src_idx, src_f in enumerate(src_files):
-            # Get destination filename/keyname
-            dst_f = dst_files[src_idx]
-            dst_k = dst_f.replace(s3_prefix, '').lstrip('/')
+        # Get destination keynames; every dst_f starts with s3_prefix
+        prefix_len = len(s3_prefix)
+        dst_keys = [dst_f[prefix_len:].lstrip('/') for dst_f in dst_files]
 
-            # See if same file is already up there
+        def _needs_upload(src_f, dst_f, dst_k):
+            # See if same file is already up there; the client, unlike the
+            # bucket resource, is safe to share between threads
             try:
-                dst_obj = bucket.Object(key=dst_k)
-                dst_md5 = dst_obj.e_tag.strip('"')
+                dst_md5 = bucket.meta.client.head_object(
+                    Bucket=bucket.name, Key=dst_k)['ETag'].strip('"')
 
-                # See if same file is already there
-                src_read = open(src_f, 'rb').read()
-                src_md5 = hashlib.md5(src_read).hexdigest()
-                # Move to next loop iteration
+                # See if same file is already there; a multipart upload's
+                # ETag is not the MD5 of the whole file
+                if '-' in dst_md5:
+                    src_md5 = _multipart_etag(src_f)
+                else:
+                    src_md5 = _md5_file(src_f)
                 if dst_md5 == src_md5:
                     iflogger.info('File %s already exists on S3, skipping...',
                                   dst_f)
-                    continue
+                    return False
                 else:
                     iflogger.info('Overwriting previous S3 file...')
 
             except ClientError:
                 iflogger.info('New file to S3')
 
-            # Copy file up to S3 (either encrypted or not)
+            return True
+
+        # Each check is an S3 round trip, so run them concurrently
+        with ThreadPoolExecutor(max_workers=S3_MAX_WORKERS) as executor:
+            checks = [executor.submit(_needs_upload, *paths) for paths in
+                      zip(src_files, dst_files, dst_keys)]
+            done, not_done = wait(checks, return_when=FIRST_EXCEPTION)
+            # On the first failure, drop the checks still queued rather than
+            # waiting on their round trips before raising
+            for check in done:
+                if check.exception() is not None:
+                    for pending in not_done:
+                        pending.cancel()
+                    raise check.exception()
+            needs_upload = [check.result() for check in checks]
+
+        # Copy files up to S3 (either encrypted or not)
+        if self.inputs.encrypt_bucket_keys:
+            extra_args = {'ServerSideEncryption': 'AES256'}
+        else:
+            extra_args = {}
+
+        # Large files go up in parts, several parts at a time
+        transfer_config = TransferConfig(
+            multipart_threshold=S3_MULTIPART_CHUNK_SIZE,
+            multipart_chunksize=S3_MULTIPART_CHUNK_SIZE,
+            max_concurrency=S3_MAX_WORKERS)
+
+        # Iterate over src and copy to dst
+        for src_f, dst_f, dst_k, upload in zip(src_files, dst_files,
+                                               dst_keys, needs_upload):
+            # Move to next loop iteration
+            if not upload:
+                continue
+
             iflogger.info('Uploading %s to S3 bucket, %s, as %s...', src_f,
                           bucket.name, dst_f)
-            if self.inputs.encrypt_bucket_keys:
-                extra_args = {'ServerSideEncryption': 'AES256'}
-            else:
-                extra_args = {}
 
             retry_exc = None
             for _ in range(RETRY):
@@ -445,7 +532,8 @@ class DataSink(IOBase):
                         src_f,
                         dst_k,
                         ExtraArgs=extra_args,
-                        Callback=ProgressPercentage(src_f)
+                        Callback=ProgressPercentage(src_f),
+                        Config=transfer_config
                     )
                     break
                 except Exception as exc:
@@ -562,8 +650,9 @@ class DataSink(IOBase):
                     out_files.append(s3dst)
                 # Otherwise, copy locally src -> dst
                 if not s3_flag or isdefined(self.inputs.local_copy):
-                    # Create output directory if it doesn't exist
-                    if not os.path.exists(path):
+                    # Create output directory if it doesn't exist; a bare
+                    # access check is cheaper than the stat behind exists
+                    if not os.access(path, os.F_OK):
                         try:
                             os.makedirs(path)
                         except OSError as inst:
@@ -573,7 +662,7 @@ class DataSink(IOBase):
                                 raise (inst)
                     try:
                         # If src == dst, it's already home
-                        if (not os.path.exists(dst)) or (
+                        if (not os.access(dst, os.F_OK)) or (
                             os.stat(src) != os.stat(dst)
                         ):
                             # If src is a file, copy it to dst
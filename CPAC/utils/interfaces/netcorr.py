@@ -207,10 +207,9 @@ class NetCorr(AFNICommand):
         outputs["out_corr_matrix"] = glob.glob(
             os.path.join(odir, "*.netcc"))[0]
 
-        if (
-            isdefined(self.inputs.ts_wb_corr) or
-            isdefined(self.inputs.ts_wb_Z)
-        ):
+        if any(isdefined(flag) and flag for flag in (
+            self.inputs.ts_wb_corr, self.inputs.ts_wb_Z
+        )):
             corrdir = os.path.join(odir, prefix + "_000_INDIV")
             outputs["out_corr_maps"] = glob.glob(
                 os.path.join(corrdir, "*.nii.gz"))
@@ -0,0 +1,116 @@
+# Copyright (C) 2023  C-PAC Developers
+
+# This file is part of C-PAC.
+
+# C-PAC is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the
+# Free Software Foundation, either version 3 of the License, or (at your
+# option) any later version.
+
+# C-PAC is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General Public
+# License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with C-PAC. If not, see <https://www.gnu.org/licenses/>.
+"""Tests for DataSink helpers"""
+import hashlib
+import os
+from botocore.exceptions import ClientError
+import pytest
+from ..datasink import DataSink, MD5_CHUNK_SIZE, _md5_file, _multipart_etag
+
+
+class _StubClient:
+    """Answers HEAD requests from a dict of uploaded keys"""
+    def __init__(self, objects, error=None):
+        self.objects = objects
+        self.error = error
+
+    def head_object(self, Bucket, Key):
+        if self.error is not None:
+            raise self.error
+        if Key not in self.objects:
+            raise ClientError({'Error': {'Code': '404'}}, 'HeadObject')
+        return {'ETag': '"%s"' % self.objects[Key]}
+
+
+class _StubBucket:
+    """Records single-part uploads as key -> MD5 ETag"""
+    name = 'bucket'
+
+    def __init__(self, error=None):
+        self.objects = {}
+        self.uploaded = []
+        self.meta = type('meta', (), {
+            'client': _StubClient(self.objects, error)})()
+
+    def upload_file(self, Filename, Key, **kwargs):
+        with open(Filename, 'rb') as src:
+            self.objects[Key] = hashlib.md5(src.read()).hexdigest()
+        self.uploaded.append(Key)
+
+
+@pytest.fixture
+def source_tree(tmp_path):
+    """A small output directory with nested files"""
+    root = tmp_path / 'outputs'
+    (root / 'func' / 'deep').mkdir(parents=True)
+    for path in ['anat.nii.gz', 'func/bold.nii.gz', 'func/deep/motion.1D']:
+        (root / path).write_bytes(os.urandom(64))
+    return root
+
+
+def test_md5_file(tmp_path):
+    """Chunked hashing should match hashing the whole file at once"""
+    contents = os.urandom(int(2.5 * MD5_CHUNK_SIZE))
+    path = tmp_path / 'image.nii.gz'
+    path.write_bytes(contents)
+    assert _md5_file(str(path)) == hashlib.md5(contents).hexdigest()
+
+
+def test_multipart_etag(tmp_path):
+    """Multipart ETags hash the part digests and count the parts"""
+    parts = [os.urandom(1024), os.urandom(1024), os.urandom(512)]
+    path = tmp_path / 'image.nii.gz'
+    path.write_bytes(b''.join(parts))
+    digests = b''.join(hashlib.md5(part).digest() for part in parts)
+    assert _multipart_etag(str(path), part_size=1024) == \
+        hashlib.md5(digests).hexdigest() + '-3'
+
+
+def test_upload_to_s3_tree(source_tree):
+    """New files go up, unchanged files are skipped, changed files go up"""
+    bucket = _StubBucket()
+    src = os.path.join(str(source_tree), '')
+    keys = ['out/sub-1/anat.nii.gz', 'out/sub-1/func/bold.nii.gz',
+            'out/sub-1/func/deep/motion.1D']
+
+    DataSink()._upload_to_s3(bucket, src, 's3://bucket/out/sub-1/')
+    assert sorted(bucket.uploaded) == keys
+
+    bucket.uploaded.clear()
+    DataSink()._upload_to_s3(bucket, src, 'S3://bucket/out/sub-1/')
+    assert bucket.uploaded == []
+
+    (source_tree / 'func' / 'bold.nii.gz').write_bytes(b'changed')
+    DataSink()._upload_to_s3(bucket, src, 's3://bucket/out/sub-1/')
+    assert bucket.uploaded == ['out/sub-1/func/bold.nii.gz']
+
+
+def test_upload_to_s3_single_file(source_tree):
+    """A file sink uploads to exactly its destination key"""
+    bucket = _StubBucket()
+    DataSink()._upload_to_s3(bucket, str(source_tree / 'anat.nii.gz'),
+                             's3://bucket/out/anat/T1w.nii.gz')
+    assert bucket.uploaded == ['out/anat/T1w.nii.gz']
+
+
+def test_upload_to_s3_head_error(source_tree):
+    """Errors other than a missing key propagate and nothing is uploaded"""
+    bucket = _StubBucket(error=ConnectionError('connection dropped'))
+    with pytest.raises(ConnectionError):
+        DataSink()._upload_to_s3(bucket, os.path.join(str(source_tree), ''),
+                                 's3://bucket/out/sub-1/')
+    assert bucket.uploaded == []